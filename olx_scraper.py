@@ -5,11 +5,17 @@ Multiple approaches when direct scraping is blocked
 """
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
 import csv
 import json
 import time
 import random
+import re
+from functools import lru_cache
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import sqlite3
 from selenium import webdriver
@@ -17,8 +23,62 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 import undetected_chromedriver as uc
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Listing field patterns, compiled once for the parser loop
+_PRICE_RE = re.compile(r'₹[\d,]+|Rs\.?\s*[\d,]+')
+_LOC_RE = re.compile(r'\b[A-Z][a-z]+,\s*[A-Z][a-z]+\b')
+_DATE_RE = re.compile(r'today|yesterday|\d+\s*(?:day|hour)s?\s*ago', re.I)
+
+# Listing cards, and any element that marks a loaded listing
+CARD_SELECTOR = '[data-aut-id="itemBox"], .EIR5N'
+LISTING_SELECTOR = f'{CARD_SELECTOR}, a[href*="/item/"]'
+
+# Runs in the browser: matches every listing in one document walk and returns
+# the raw fields of each in a single WebDriver round-trip. An /item/ link
+# nested in a matched card is that card's own link, so it is skipped.
+_EXTRACT_LISTINGS_JS = """
+const [cardSelector, listingSelector] = arguments;
+return Array.from(document.querySelectorAll(listingSelector))
+    .filter(e => !(e.parentElement && e.parentElement.closest(cardSelector)))
+    .map(e => {
+        const a = e.tagName === 'A' ? e : e.querySelector('a');
+        const t = e.querySelector('h2, h3, h4, span[title]');
+        const img = e.querySelector('img');
+        return {
+            href: a ? a.href : null,
+            text: e.innerText,
+            title: t ? t.innerText : null,
+            img: img ? img.src : null
+        };
+    });
+"""
+
+# ============================================================================
+# SHARED HTTP SESSION
+# ============================================================================
+
+def create_session():
+    """Create a requests session with keep-alive connection pooling and retries"""
+    session = requests.Session()
+    # Retry only on gateway errors; connection and read failures (dead proxies,
+    # missing endpoints) must fail fast so rotation and probing move on
+    retries = Retry(total=3, connect=0, read=0, backoff_factor=0.5,
+                    status_forcelist=[502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # Accept-Encoding is left to requests, which only advertises br when a
+    # Brotli decoder is importable
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
 # ============================================================================
 # SOLUTION 1: SELENIUM WITH UNDETECTED CHROME DRIVER
 # ============================================================================
@@ -28,6 +88,7 @@ class SeleniumOLXScraper:
         self.base_url = "https://www.olx.in"
         self.search_url = "https://www.olx.in/items/q-car-cover"
         self.driver = None
+        self._seen_links = set()
         
     def setup_driver(self):
         """Setup undetected Chrome driver"""
@@ -41,17 +102,37 @@ class SeleniumOLXScraper:
             options.add_experimental_option("excludeSwitches", ["enable-automation"])
             options.add_experimental_option('useAutomationExtension', False)
             
-            # Optional: Run in headless mode (comment out to see browser)
-            # options.add_argument("--headless")
+            # No images: only the img src string is scraped, never the pixels
+            options.add_argument("--disable-gpu")
+            options.add_argument("--blink-settings=imagesEnabled=false")
+            options.add_argument("--disable-extensions")
+            options.add_argument("--disable-background-networking")
+            options.add_argument("--disable-sync")
+            options.add_experimental_option("prefs", {
+                "profile.managed_default_content_settings.images": 2,
+                "profile.default_content_setting_values.notifications": 2
+            })
             
-            self.driver = uc.Chrome(options=options)
+            # Let uc enable headless itself so it also applies its stealth patches
+            # (e.g. stripping "Headless" from the user agent)
+            self.driver = uc.Chrome(options=options, headless=True)
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+            # Keep the HTTP cache on so CSS/JS bundles are reused across pages;
+            # best effort only, a failure here must not abort setup
+            try:
+                self.driver.execute_cdp_cmd("Network.setCacheDisabled", {"cacheDisabled": False})
+            except Exception as e:
+                print(f"  ⚠ Could not configure browser cache: {e}")
             
             print("✅ Driver setup complete")
             return True
             
         except Exception as e:
             print(f"❌ Driver setup failed: {e}")
+            # The browser may already be running; don't leave it behind
+            if self.driver:
+                self.driver.quit()
+                self.driver = None
             return False
     
     def scrape_with_selenium(self, max_pages=3):
@@ -60,6 +141,7 @@ class SeleniumOLXScraper:
             return []
         
         all_listings = []
+        self._seen_links.clear()
         
         try:
             for page in range(1, max_pages + 1):
@@ -72,16 +154,13 @@ class SeleniumOLXScraper:
                 
                 self.driver.get(url)
                 
-                # Wait for page to load
-                time.sleep(random.uniform(3, 6))
-                
-                # Wait for listings to appear
+                # Wait for the listings themselves; header links load long before them
                 try:
-                    WebDriverWait(self.driver, 10).until(
-                        EC.presence_of_element_located((By.TAG_NAME, "a"))
+                    WebDriverWait(self.driver, 15).until(
+                        EC.presence_of_all_elements_located((By.CSS_SELECTOR, LISTING_SELECTOR))
                     )
-                except:
-                    print("  ⚠ Timeout waiting for page elements")
+                except TimeoutException:
+                    print("  ⚠ Timeout waiting for listings")
                 
                 # Extract listings
                 page_listings = self.extract_selenium_listings()
@@ -113,108 +192,75 @@ class SeleniumOLXScraper:
         """Extract listings from current page"""
         listings = []
         
-        # Try multiple selectors
-        selectors = [
-            '[data-aut-id="itemBox"]',
-            '.EIR5N',
-            'a[href*="/item/"]'
-        ]
+        # One script call returns every field, instead of several WebDriver calls per element
+        rows = self.driver.execute_script(_EXTRACT_LISTINGS_JS, CARD_SELECTOR, LISTING_SELECTOR)
+        if not rows:
+            return listings
         
-        for selector in selectors:
-            elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-            if elements:
-                print(f"  ✓ Found {len(elements)} elements with selector: {selector}")
-                
-                for element in elements:
-                    try:
-                        listing = self.parse_selenium_element(element)
-                        if listing:
-                            listings.append(listing)
-                    except Exception as e:
-                        continue
-                
-                break
+        print(f"  ✓ Found {len(rows)} listing elements")
+        
+        for row in rows:
+            # Skip links already collected on this or an earlier page before parsing
+            if row.get('href') in self._seen_links:
+                continue
+            listing = self.parse_listing_row(row)
+            if listing:
+                listings.append(listing)
+                self._seen_links.add(listing['link'])
         
-        return self.deduplicate_listings(listings)
+        return listings
     
-    def parse_selenium_element(self, element):
-        """Parse individual listing element"""
-        try:
-            listing = {}
-            
-            # Get all text from element
-            element_text = element.text
-            element_html = element.get_attribute('outerHTML')
-            
-            # Try to find link
-            link_elem = element if element.tag_name == 'a' else element.find_element(By.TAG_NAME, 'a')
-            href = link_elem.get_attribute('href') if link_elem else None
-            
-            if not href or '/item/' not in href:
-                return None
-            
-            listing['link'] = href
-            
-            # Extract title from link text or nearby elements
-            title = element_text.split('\n')[0] if element_text else ""
-            if len(title) < 5:
-                title_elem = element.find_element(By.CSS_SELECTOR, 'h2, h3, h4, span[title]')
-                title = title_elem.text if title_elem else ""
-            
-            if len(title) < 5:
-                return None
-            
-            listing['title'] = title.strip()
-            
-            # Extract price
-            price_match = re.search(r'₹[\d,]+|Rs\.?\s*[\d,]+', element_text)
-            listing['price'] = price_match.group() if price_match else "N/A"
-            
-            # Extract location
-            location_match = re.search(r'\b[A-Z][a-z]+,\s*[A-Z][a-z]+\b', element_text)
-            listing['location'] = location_match.group() if location_match else "N/A"
-            
-            # Extract date
-            date_match = re.search(r'today|yesterday|\d+\s*(day|hour)s?\s*ago', element_text, re.I)
-            listing['date'] = date_match.group() if date_match else "N/A"
-            
-            # Try to find image
-            try:
-                img_elem = element.find_element(By.TAG_NAME, 'img')
-                listing['image_url'] = img_elem.get_attribute('src') or "N/A"
-            except:
-                listing['image_url'] = "N/A"
-            
-            return listing
-            
-        except Exception as e:
+    def parse_listing_row(self, row):
+        """Parse individual listing row returned by the extraction script"""
+        listing = {}
+        
+        element_text = row.get('text') or ""
+        href = row.get('href')
+        
+        if not href or '/item/' not in href:
             return None
-    
-    def deduplicate_listings(self, listings):
-        """Remove duplicates"""
-        unique_listings = []
-        seen_links = set()
-        
-        for listing in listings:
-            link = listing.get('link', '')
-            if link and link not in seen_links:
-                unique_listings.append(listing)
-                seen_links.add(link)
-        
-        return unique_listings
+        
+        listing['link'] = href
+        
+        # Extract title from link text or nearby elements
+        title = element_text.split('\n')[0]
+        if len(title) < 5:
+            title = row.get('title') or ""
+        
+        if len(title) < 5:
+            return None
+        
+        listing['title'] = title.strip()
+        
+        # Extract price
+        price_match = _PRICE_RE.search(element_text)
+        listing['price'] = price_match.group() if price_match else "N/A"
+        
+        # Extract location
+        location_match = _LOC_RE.search(element_text)
+        listing['location'] = location_match.group() if location_match else "N/A"
+        
+        # Extract date
+        date_match = _DATE_RE.search(element_text)
+        listing['date'] = date_match.group() if date_match else "N/A"
+        
+        listing['image_url'] = row.get('img') or "N/A"
+        
+        return listing
 
 # ============================================================================
 # SOLUTION 2: API-BASED APPROACH (Check for unofficial APIs)
 # ============================================================================
 
 class APIBasedScraper:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+    def __init__(self, session=None):
+        self.session = session or create_session()
+        # Sent per request so a shared session keeps its own defaults
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15',
             'Accept': 'application/json',
             'Accept-Language': 'en-US,en;q=0.9'
-        })
+        }
     
     def search_olx_api(self, query="car cover", location="", limit=50):
         """Try to find and use OLX's mobile/internal API"""
@@ -238,11 +284,15 @@ class APIBasedScraper:
                 }
                 
                 print(f"  → Trying: {api_url}")
-                response = self.session.get(api_url, params=params, timeout=10)
+                response = self.session.get(api_url, params=params, headers=self.headers, timeout=10)
+                
+                # Invalid endpoints answer with HTML error pages; don't try to parse those
+                if not response.headers.get('Content-Type', '').startswith('application/json'):
+                    continue
                 
                 if response.status_code == 200:
                     try:
-                        data = response.json()
+                        data = load_json(response.content)
                         if 'data' in data or 'results' in data or 'ads' in data:
                             print(f"  ✅ Found working API endpoint!")
                             return self.parse_api_response(data)
@@ -282,10 +332,26 @@ class APIBasedScraper:
 # SOLUTION 3: PROXY-BASED SCRAPER
 # ============================================================================
 
+@lru_cache(maxsize=4096)
+def probe_proxy(proxy_url):
+    """Check a proxy once per run; results are cached per proxy URL"""
+    try:
+        response = requests.get(
+            'http://httpbin.org/ip', 
+            proxies={'http': proxy_url, 'https': proxy_url}, 
+            timeout=3
+        )
+        return response.status_code == 200
+    except:
+        return False
+
 class ProxyBasedScraper:
-    def __init__(self):
+    def __init__(self, session=None):
+        self.session = session or create_session()
+        # Raw ingest from the proxy sources; evictions only touch the rotation
         self.proxies_list = []
-        self.current_proxy_index = 0
+        # Live rotation of host:port strings
+        self.proxies = deque()
         
     def get_free_proxies(self):
         """Get free proxy list"""
@@ -298,15 +364,24 @@ class ProxyBasedScraper:
                 "https://raw.githubusercontent.com/TheSpeedX/PROXY-List/master/http.txt"
             ]
             
+            # Stream each list line by line; the set drops repeats across sources
+            seen = set(self.proxies_list)
             for url in proxy_urls:
                 try:
-                    response = requests.get(url, timeout=10)
-                    if response.status_code == 200:
-                        proxies = response.text.strip().split('\n')
-                        self.proxies_list.extend([p.strip() for p in proxies if ':' in p])
+                    with self.session.get(url, stream=True, timeout=10) as response:
+                        if response.status_code != 200:
+                            continue
+                        for line in response.iter_lines():
+                            proxy = line.decode('utf-8', 'ignore').strip()
+                            if ':' in proxy and proxy not in seen:
+                                seen.add(proxy)
+                                self.proxies_list.append(proxy)
                 except:
                     continue
             
+            # Shuffle once so separate runs don't all start on the same proxy
+            random.shuffle(self.proxies_list)
+            self.proxies = deque(self.proxies_list)
             print(f"  ✅ Found {len(self.proxies_list)} proxies")
             return len(self.proxies_list) > 0
             
@@ -315,13 +390,25 @@ class ProxyBasedScraper:
             return False
     
     def get_next_proxy(self):
-        """Get next proxy from list"""
-        if not self.proxies_list:
-            return None
+        """Get next proxy from the rotation as a (host:port, proxies mapping) pair"""
+        if not self.proxies:
+            return None, None
         
-        proxy = self.proxies_list[self.current_proxy_index]
-        self.current_proxy_index = (self.current_proxy_index + 1) % len(self.proxies_list)
+        proxy = self.proxies.popleft()
+        self.proxies.append(proxy)
         
+        return proxy, self._as_dict(proxy)
+    
+    def evict_proxy(self, proxy):
+        """Drop a host:port proxy from the rotation"""
+        try:
+            self.proxies.remove(proxy)
+        except ValueError:
+            pass
+    
+    @staticmethod
+    def _as_dict(proxy):
+        """Build a requests proxies mapping for a host:port string"""
         return {
             'http': f'http://{proxy}',
             'https': f'http://{proxy}'
@@ -329,15 +416,24 @@ class ProxyBasedScraper:
     
     def test_proxy(self, proxy):
         """Test if proxy is working"""
-        try:
-            response = requests.get(
-                'http://httpbin.org/ip', 
-                proxies=proxy, 
-                timeout=5
-            )
-            return response.status_code == 200
-        except:
-            return False
+        return probe_proxy(proxy['http'])
+    
+    def log_probe_cache(self):
+        """Print hit/miss counts of the proxy test cache"""
+        info = probe_proxy.cache_info()
+        print(f"  📊 Proxy test cache: {info.hits} hits, {info.misses} misses")
+    
+    def prefilter_proxies(self, limit=128, max_workers=32):
+        """Test the first `limit` proxies concurrently and drop the dead ones"""
+        candidates = [self.proxies.popleft() for _ in range(min(limit, len(self.proxies)))]
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(self.test_proxy, map(self._as_dict, candidates)))
+        
+        # Live proxies go first; untested ones stay behind them in the rotation
+        live = [proxy for proxy, ok in zip(candidates, results) if ok]
+        self.proxies.extendleft(reversed(live))
+        print(f"  ✅ {len(live)}/{len(candidates)} tested proxies are live")
     
     def scrape_with_proxy_rotation(self, max_attempts=10):
         """Scrape using proxy rotation"""
@@ -345,43 +441,49 @@ class ProxyBasedScraper:
             print("❌ No proxies available")
             return []
         
+        self.prefilter_proxies()
+        
         for attempt in range(max_attempts):
-            proxy = self.get_next_proxy()
+            key, proxy = self.get_next_proxy()
+            if proxy is None:
+                break
             
             if not self.test_proxy(proxy):
                 print(f"  ⚠ Proxy {proxy['http']} failed test")
+                self.evict_proxy(key)
                 continue
             
             try:
                 print(f"  → Trying proxy: {proxy['http']}")
                 
-                session = requests.Session()
-                session.headers.update({
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-                })
-                
-                response = session.get(
+                response = self.session.get(
                     'https://www.olx.in/items/q-car-cover',
+                    headers={
+                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+                    },
                     proxies=proxy,
                     timeout=15
                 )
                 
                 if response.status_code == 200:
                     print(f"  ✅ Success with proxy: {proxy['http']}")
+                    self.log_probe_cache()
                     # Parse response here
                     return self.parse_html_response(response.text)
                 
             except Exception as e:
                 print(f"  ⚠ Proxy {proxy['http']} failed: {str(e)[:50]}")
+                self.evict_proxy(key)
                 continue
         
+        self.log_probe_cache()
         print("❌ All proxy attempts failed")
         return []
     
     def parse_html_response(self, html):
         """Parse HTML response"""
         # Use similar parsing logic as before
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = BeautifulSoup(html, 'lxml')
         # ... parsing logic ...
         return []
 
@@ -390,8 +492,8 @@ class ProxyBasedScraper:
 # ============================================================================
 
 class AlternativeDataSources:
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, session=None):
+        self.session = session or create_session()
     
     def scrape_amazon_car_covers(self):
         """Scrape Amazon for car cover data (usually less protected)"""
@@ -406,7 +508,9 @@ class AlternativeDataSources:
             response = self.session.get(url, headers=headers)
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
+                # Only build the tree for result cards, not the whole page
+                only_results = SoupStrainer('div', {'data-component-type': 's-search-result'})
+                soup = BeautifulSoup(response.text, 'lxml', parse_only=only_results)
                 products = soup.find_all('div', {'data-component-type': 's-search-result'})
                 
                 listings = []
@@ -454,7 +558,7 @@ class AlternativeDataSources:
             response = self.session.get(url, headers=headers)
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = BeautifulSoup(response.text, 'lxml')
                 # Flipkart parsing logic here
                 print("  ✅ Flipkart connection successful")
                 return []  # Implement parsing
@@ -473,6 +577,7 @@ def main():
     print("=" * 60)
     
     all_listings = []
+    session = create_session()
     
     # Method 1: Try Selenium
     print("\n🔧 METHOD 1: Selenium with Undetected Chrome")
@@ -490,7 +595,7 @@ def main():
     # Method 2: Try API approach
     print("\n🔧 METHOD 2: API-based approach")
     try:
-        api_scraper = APIBasedScraper()
+        api_scraper = APIBasedScraper(session)
         api_listings = api_scraper.search_olx_api()
         if api_listings:
             all_listings.extend(api_listings)
@@ -503,7 +608,7 @@ def main():
     # Method 3: Try alternative sources
     print("\n🔧 METHOD 3: Alternative sources")
     try:
-        alt_scraper = AlternativeDataSources()
+        alt_scraper = AlternativeDataSources(session)
         amazon_listings = alt_scraper.scrape_amazon_car_covers()
         if amazon_listings:
             all_listings.extend(amazon_listings)
@@ -523,22 +628,39 @@ def main():
         print("   • Consider manual data collection")
         print("   • Look into paid proxy services")
 
+def load_json(data):
+    """Parse JSON bytes, using orjson when installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dump_json(obj):
+    """Serialize obj to compact UTF-8 JSON bytes, using orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
 def save_results(listings):
-    """Save all collected listings"""
-    # Save to CSV
-    with open('alternative_car_covers.csv', 'w', newline='', encoding='utf-8-sig') as f:
-        if listings:
-            writer = csv.DictWriter(f, fieldnames=listings[0].keys())
-            writer.writeheader()
-            writer.writerows(listings)
+    """Save all collected listings to CSV and JSON in a single pass"""
+    # Sources differ in fields (e.g. Amazon adds 'source'), so use every key seen
+    fieldnames = list(dict.fromkeys(key for listing in listings for key in listing))
     
-    # Save to JSON
-    with open('alternative_car_covers.json', 'w', encoding='utf-8') as f:
-        json.dump({
-            'timestamp': datetime.now().isoformat(),
-            'total_listings': len(listings),
-            'listings': listings
-        }, f, indent=2, ensure_ascii=False)
+    with open('alternative_car_covers.csv', 'w', newline='', encoding='utf-8-sig', buffering=1 << 20) as csv_file, \
+         open('alternative_car_covers.json', 'wb') as json_file:
+        writer = csv.writer(csv_file)
+        if listings:
+            writer.writerow(fieldnames)
+        
+        # Stream the JSON document around the listings instead of building it in memory
+        json_file.write(b'{\n  "timestamp": ' + dump_json(datetime.now().isoformat()))
+        json_file.write(b',\n  "total_listings": ' + dump_json(len(listings)))
+        json_file.write(b',\n  "listings": [')
+        
+        for i, listing in enumerate(listings):
+            writer.writerow([listing.get(key, '') for key in fieldnames])
+            json_file.write((b',\n    ' if i else b'\n    ') + dump_json(listing))
+        
+        json_file.write(b'\n  ]\n}' if listings else b']\n}')
     
     print("💾 Results saved to alternative_car_covers.csv and .json")
 